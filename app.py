@@ -6,6 +6,11 @@ import shutil
 import os
 import json
 import datetime
+import re
+import uuid
+import queue
+import threading
+import time
 from pathlib import Path
 import base64 # 新增导入
 
@@ -144,14 +149,17 @@ def get_molstar_html(mmcif_base64):
         '>
     </iframe>"""
 
+def get_molstar_html_from_bytes(mmcif_bytes):
+    """将 mmCIF 字节内容编码后生成 Mol* 查看器 HTML"""
+    mmcif_base64 = base64.b64encode(mmcif_bytes).decode('utf-8')
+    return get_molstar_html(mmcif_base64)
+
 def get_initial_molstar_html():
     """为 Gradio 界面生成初始的 Mol* 查看器 HTML。"""
     default_cif_path = Path("example.cif") # 假设 example.cif 在应用根目录
     if default_cif_path.exists():
         try:
-            mmcif_bytes = default_cif_path.read_bytes()
-            mmcif_base64 = base64.b64encode(mmcif_bytes).decode('utf-8')
-            return get_molstar_html(mmcif_base64)
+            return get_molstar_html_from_bytes(default_cif_path.read_bytes())
         except Exception as e:
             error_message = f"加载默认 example.cif 时出错: {e}"
             print(error_message)
@@ -160,6 +168,675 @@ def get_initial_molstar_html():
         # 如果 example.cif 不存在，返回一个空的 Mol* 查看器或提示信息
         return get_molstar_html("") # 传递空字符串，让 Mol* 内部处理或显示无数据
 
+# --- 批量导入：FASTA / Boltz YAML / mmCIF / PDB ---
+# Boltz 实体类型与界面分子类型之间的映射
+BOLTZ_ENTITY_TO_MOL_TYPE = {"protein": "蛋白质", "dna": "DNA", "rna": "RNA"}
+
+# 各分子类型允许的字符 (已转换为大写)
+PROTEIN_ALPHABET = set("ACDEFGHIKLMNPQRSTVWYXBZUO")
+DNA_ALPHABET = set("ACGTN")
+RNA_ALPHABET = set("ACGUN")
+
+# PDB SEQRES 三字母代码 -> 单字母代码
+THREE_TO_ONE = {
+    "ALA": "A", "ARG": "R", "ASN": "N", "ASP": "D", "CYS": "C",
+    "GLN": "Q", "GLU": "E", "GLY": "G", "HIS": "H", "ILE": "I",
+    "LEU": "L", "LYS": "K", "MET": "M", "PHE": "F", "PRO": "P",
+    "SER": "S", "THR": "T", "TRP": "W", "TYR": "Y", "VAL": "V",
+    "SEC": "U", "PYL": "O", "MSE": "M",
+}
+DNA_RESIDUES = {"DA": "A", "DC": "C", "DG": "G", "DT": "T", "DN": "N"}
+RNA_RESIDUES = {"A": "A", "C": "C", "G": "G", "U": "U", "N": "N"}
+
+def sequences_to_display(sequences):
+    """将序列配置转换为 Dataframe 显示格式（长序列截断显示）"""
+    return [[seq["chain_id"], seq["mol_type"], seq["sequence"][:50] + "..." if len(seq["sequence"]) > 50 else seq["sequence"]]
+            for seq in sequences]
+
+def guess_polymer_type(sequence):
+    """根据序列字符推断聚合物类型：仅含 ACGT(N) 视为 DNA，仅含 ACGU(N) 视为 RNA，否则为蛋白质"""
+    letters = set(sequence.upper())
+    if letters <= DNA_ALPHABET:
+        return "DNA"
+    if letters <= RNA_ALPHABET:
+        return "RNA"
+    return "蛋白质"
+
+def validate_sequence_entry(entry):
+    """校验单个分子配置，返回错误信息；合法时返回 None"""
+    chain_id = entry["chain_id"]
+    mol_type = entry["mol_type"]
+    sequence = entry["sequence"]
+
+    if not chain_id or not sequence:
+        return "链ID和序列不能为空"
+    if any(c.isspace() for c in chain_id) or "," in chain_id:
+        return f"链ID '{chain_id}' 不能包含空白字符或逗号"
+
+    alphabets = {"蛋白质": PROTEIN_ALPHABET, "DNA": DNA_ALPHABET, "RNA": RNA_ALPHABET}
+    if mol_type in alphabets:
+        invalid = sorted(set(sequence.upper()) - alphabets[mol_type])
+        if invalid:
+            return f"链 '{chain_id}' 的{mol_type}序列包含非法字符: {''.join(invalid)}"
+    elif mol_type == "配体(SMILES)":
+        if any(c.isspace() for c in sequence):
+            return f"链 '{chain_id}' 的SMILES字符串不能包含空白字符"
+    elif mol_type == "配体(CCD)":
+        if not sequence.isalnum() or len(sequence) > 5:
+            return f"链 '{chain_id}' 的CCD代码 '{sequence}' 无效"
+    else:
+        return f"链 '{chain_id}' 的分子类型 '{mol_type}' 不受支持"
+    return None
+
+def parse_rcsb_chain_ids(field):
+    """解析 RCSB FASTA 表头中的链字段，如 `Chains A, B` 或 `Chain A[auth C]`，优先使用作者链ID"""
+    match = re.match(r"^Chains?\s+(.+)$", field)
+    if not match:
+        return None
+    chain_ids = []
+    for item in match.group(1).split(","):
+        item = item.strip()
+        auth = re.match(r"^\S+\[auth\s+([^\]]+)\]$", item)
+        chain_ids.append(auth.group(1).strip() if auth else item)
+    return [cid for cid in chain_ids if cid]
+
+def parse_fasta(text):
+    """
+    解析多记录 FASTA。
+    支持 Boltz 风格的表头 `>A|protein|...` / `>L|smiles` / `>L|ccd`；
+    RCSB 风格的表头 `>101M_1|Chains A, B|...` 按链展开为多条记录；
+    简单表头 (如 `>A`) 直接作为链ID，其他表头 (如 UniProt) 的链ID留空，稍后自动分配。
+    UniProt 表头 (`>sp|...` / `>tr|...`) 视为蛋白质，其余未注明类型的记录根据序列推断类型。
+    """
+    entries = []
+    header, seq_lines = None, []
+
+    def flush():
+        if header is None:
+            return
+        sequence = "".join(seq_lines)
+        parts = [p.strip() for p in header.split("|")]
+        chain_ids, mol_type = [None], None
+        rcsb_chain_ids = parse_rcsb_chain_ids(parts[1]) if len(parts) >= 2 else None
+        if len(parts) >= 2 and parts[1].lower() in ("protein", "dna", "rna", "smiles", "ccd"):
+            chain_ids = [parts[0] or None]
+            entity = parts[1].lower()
+            if entity == "smiles":
+                mol_type = "配体(SMILES)"
+            elif entity == "ccd":
+                mol_type = "配体(CCD)"
+            else:
+                mol_type = BOLTZ_ENTITY_TO_MOL_TYPE[entity]
+        elif rcsb_chain_ids:
+            chain_ids = rcsb_chain_ids
+        elif parts[0].lower() in ("sp", "tr"):
+            mol_type = "蛋白质"
+        elif len(parts) == 1 and parts[0].isalnum() and len(parts[0]) <= 4:
+            chain_ids = [parts[0]]
+        if mol_type is None or mol_type in BOLTZ_ENTITY_TO_MOL_TYPE.values():
+            sequence = sequence.upper().rstrip("*")  # 去除聚合物序列末尾的终止符
+        if mol_type is None:
+            mol_type = guess_polymer_type(sequence)
+        for chain_id in chain_ids:
+            entries.append({"chain_id": chain_id, "mol_type": mol_type, "sequence": sequence})
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith(";"):
+            continue
+        if line.startswith(">"):
+            flush()
+            header, seq_lines = line[1:].strip(), []
+        elif header is not None:
+            seq_lines.append("".join(line.split()))
+    flush()
+    return entries
+
+def parse_boltz_yaml(text):
+    """
+    解析 Boltz 输入 YAML 的 sequences 部分，id 为列表时展开为多条链。
+    返回 (分子配置列表, 未导入的字段列表)；msa、modifications、constraints、properties 等
+    字段无法在分子列表中表示，由调用方提示用户重新运行时会被忽略。
+    """
+    data = yaml.safe_load(text)
+    if not isinstance(data, dict) or not isinstance(data.get("sequences"), list):
+        raise ValueError("YAML 中缺少 sequences 列表")
+
+    entries = []
+    ignored_fields = [key for key in data if key not in ("version", "sequences")]
+    for item in data["sequences"]:
+        if not isinstance(item, dict) or len(item) != 1:
+            raise ValueError(f"无法识别的 sequences 条目: {item}")
+        entity, spec = next(iter(item.items()))
+        if not isinstance(spec, dict):
+            raise ValueError(f"无法识别的 sequences 条目: {item}")
+        ids = spec.get("id")
+        ids = ids if isinstance(ids, list) else [ids]
+
+        if entity in BOLTZ_ENTITY_TO_MOL_TYPE:
+            mol_type = BOLTZ_ENTITY_TO_MOL_TYPE[entity]
+            sequence = str(spec.get("sequence", ""))
+            used_keys = ("id", "sequence")
+        elif entity == "ligand" and "smiles" in spec:
+            mol_type, sequence = "配体(SMILES)", str(spec["smiles"])
+            used_keys = ("id", "smiles")
+        elif entity == "ligand" and "ccd" in spec:
+            mol_type, sequence = "配体(CCD)", str(spec["ccd"])
+            used_keys = ("id", "ccd")
+        else:
+            raise ValueError(f"不支持的实体类型: {entity}")
+
+        for key in spec:
+            if key not in used_keys:
+                field = f"{entity}.{key}"
+                if field not in ignored_fields:
+                    ignored_fields.append(field)
+
+        for chain_id in ids:
+            entries.append({"chain_id": str(chain_id) if chain_id is not None else None,
+                            "mol_type": mol_type, "sequence": sequence})
+    return entries, ignored_fields
+
+def _tokenize_cif(text):
+    """将 CIF 文本切分为 (值, 是否带引号) 的标记序列，支持分号多行文本字段"""
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith(";"):
+            block = [line[1:]]
+            i += 1
+            while i < len(lines) and not lines[i].startswith(";"):
+                block.append(lines[i])
+                i += 1
+            i += 1
+            yield "\n".join(block).strip(), True
+            continue
+
+        pos, n = 0, len(line)
+        while pos < n:
+            if line[pos].isspace():
+                pos += 1
+            elif line[pos] == "#":
+                break
+            elif line[pos] in "'\"":
+                quote = line[pos]
+                end = pos + 1
+                # 引号仅在其后紧跟空白或行尾时才结束
+                while end < n and not (line[end] == quote and (end + 1 == n or line[end + 1].isspace())):
+                    end += 1
+                yield line[pos + 1:end], True
+                pos = end + 1
+            else:
+                end = pos
+                while end < n and not line[end].isspace():
+                    end += 1
+                yield line[pos:end], False
+                pos = end
+        i += 1
+
+def _select_cif_categories(text, wanted):
+    """
+    按行快速筛选 CIF，仅保留 wanted 中类别的数据，避免对 _atom_site 等大型循环逐字符分词。
+    分号多行文本字段会被完整保留或跳过。
+    """
+    out = []
+    keep = False
+    in_text = False
+    loop_state = None  # None / "header" / "body"
+    loop_category = None
+    for line in text.splitlines():
+        if in_text:
+            if line.startswith(";"):
+                in_text = False
+            if keep:
+                out.append(line)
+            continue
+        if line.startswith(";"):
+            in_text = True
+            if keep:
+                out.append(line)
+            continue
+
+        stripped = line.strip()
+        if stripped.startswith("loop_"):
+            loop_state = "header"
+            loop_category = None
+            keep = False
+            continue
+        if stripped.startswith("_"):
+            category = stripped.split()[0].split(".", 1)[0]
+            if loop_state == "header":
+                # 循环的类别由第一个标签决定
+                if loop_category is None:
+                    loop_category = category
+                    keep = category in wanted
+                    if keep:
+                        out.append("loop_")
+            else:
+                loop_state = None
+                keep = category in wanted
+            if keep:
+                out.append(line)
+            continue
+        if stripped.startswith("data_"):
+            loop_state = None
+            keep = False
+            continue
+        if loop_state == "header":
+            loop_state = "body"
+        if keep and stripped and not stripped.startswith("#"):
+            out.append(line)
+    return "\n".join(out)
+
+def _parse_cif_categories(text):
+    """解析 CIF 为 {类别名: [行字典, ...]}，同时支持 loop_ 和单值形式"""
+    categories = {}
+    tokens = list(_tokenize_cif(text))
+    i = 0
+    while i < len(tokens):
+        value, quoted = tokens[i]
+        if not quoted and value == "loop_":
+            i += 1
+            tags = []
+            while i < len(tokens) and not tokens[i][1] and tokens[i][0].startswith("_"):
+                tags.append(tokens[i][0])
+                i += 1
+            values = []
+            while i < len(tokens):
+                value, quoted = tokens[i]
+                if not quoted and (value.startswith("_") or value == "loop_" or value.startswith("data_")):
+                    break
+                values.append(value)
+                i += 1
+            if not tags:
+                continue
+            category = tags[0].split(".")[0]
+            items = [tag.split(".", 1)[-1] for tag in tags]
+            rows = categories.setdefault(category, [])
+            for start in range(0, len(values) - len(items) + 1, len(items)):
+                rows.append(dict(zip(items, values[start:start + len(items)])))
+        elif not quoted and value.startswith("_") and "." in value and i + 1 < len(tokens):
+            category, item = value.split(".", 1)
+            rows = categories.setdefault(category, [{}])
+            rows[0][item] = tokens[i + 1][0]
+            i += 2
+        else:
+            i += 1
+    return categories
+
+def parse_mmcif(text):
+    """从 mmCIF 的 _entity_poly 中提取聚合物实体序列，按 pdbx_strand_id 展开为各条链"""
+    entity_poly = _parse_cif_categories(_select_cif_categories(text, {"_entity_poly"})).get("_entity_poly", [])
+    if not entity_poly:
+        raise ValueError("mmCIF 中未找到 _entity_poly 聚合物序列信息")
+
+    entries = []
+    for row in entity_poly:
+        poly_type = row.get("type", "").lower()
+        if poly_type == "polydeoxyribonucleotide":
+            mol_type = "DNA"
+        elif poly_type == "polyribonucleotide":
+            mol_type = "RNA"
+        elif "polypeptide" in poly_type:
+            mol_type = "蛋白质"
+        else:
+            raise ValueError(f"不支持的聚合物类型: {row.get('type')}")
+
+        sequence = row.get("pdbx_seq_one_letter_code_can", "")
+        if sequence in ("", "?", "."):
+            # 非标准残基以 (XXX) 表示，替换为 X / N
+            raw = row.get("pdbx_seq_one_letter_code", "")
+            unknown = "X" if mol_type == "蛋白质" else "N"
+            parts, depth = [], 0
+            for c in raw:
+                if c == "(":
+                    depth += 1
+                    parts.append(unknown)
+                elif c == ")":
+                    depth -= 1
+                elif depth == 0:
+                    parts.append(c)
+            sequence = "".join(parts)
+        sequence = "".join(sequence.split()).upper()
+
+        strand_ids = [s.strip() for s in row.get("pdbx_strand_id", "").split(",") if s.strip() not in ("", "?", ".")]
+        for chain_id in strand_ids or [None]:
+            entries.append({"chain_id": chain_id, "mol_type": mol_type, "sequence": sequence})
+    return entries
+
+def parse_pdb(text):
+    """从 PDB 文件的 SEQRES 记录中提取各链序列"""
+    residues_by_chain = {}
+    for line in text.splitlines():
+        if line.startswith("SEQRES"):
+            chain_id = line[11].strip()
+            residues_by_chain.setdefault(chain_id, []).extend(line[19:].split())
+    if not residues_by_chain:
+        raise ValueError("PDB 文件中未找到 SEQRES 记录")
+
+    entries = []
+    for chain_id, residues in residues_by_chain.items():
+        if all(res in DNA_RESIDUES for res in residues):
+            mol_type, sequence = "DNA", "".join(DNA_RESIDUES[res] for res in residues)
+        elif all(res in RNA_RESIDUES for res in residues):
+            mol_type, sequence = "RNA", "".join(RNA_RESIDUES[res] for res in residues)
+        else:
+            mol_type, sequence = "蛋白质", "".join(THREE_TO_ONE.get(res, "X") for res in residues)
+        entries.append({"chain_id": chain_id or None, "mol_type": mol_type, "sequence": sequence})
+    return entries
+
+def parse_sequence_file(file_path):
+    """
+    根据文件扩展名选择解析器。
+    返回 (分子配置列表, 警告信息列表)，分子配置的链ID可能为 None，待自动分配。
+    """
+    path = Path(file_path)
+    text = path.read_text(encoding="utf-8", errors="replace")
+    suffix = path.suffix.lower()
+    if suffix in (".fasta", ".fa", ".faa", ".fna", ".fas"):
+        return parse_fasta(text), []
+    if suffix in (".yaml", ".yml"):
+        entries, ignored_fields = parse_boltz_yaml(text)
+        warnings = []
+        if ignored_fields:
+            warnings.append(f"{path.name}: 以下字段未导入，重新运行时将被忽略: {', '.join(ignored_fields)}")
+        return entries, warnings
+    if suffix in (".cif", ".mmcif"):
+        return parse_mmcif(text), []
+    if suffix in (".pdb", ".ent"):
+        return parse_pdb(text), []
+    raise ValueError(f"不支持的文件类型: {path.suffix}")
+
+def next_free_chain_id(used_ids):
+    """按 A-Z、AA-ZZ 的顺序返回第一个未被占用的链ID"""
+    letters = [chr(c) for c in range(ord("A"), ord("Z") + 1)]
+    for candidate in letters + [a + b for a in letters for b in letters]:
+        if candidate not in used_ids:
+            return candidate
+    raise ValueError("可用的链ID已耗尽")
+
+def import_sequence_entries(current_sequences, entries):
+    """
+    将一批解析得到的分子配置合并到现有配置中。
+    对整批数据统一进行校验和链ID重复检查，任一条目出错则整批不导入。
+    返回 (更新后的配置, 错误信息列表)。
+    """
+    errors = []
+    used_ids = {seq["chain_id"] for seq in current_sequences}
+
+    # 先登记所有显式指定的链ID，再为缺失的链ID自动分配
+    for entry in entries:
+        chain_id = entry["chain_id"]
+        if chain_id is None:
+            continue
+        if chain_id in used_ids:
+            errors.append(f"链ID '{chain_id}' 重复")
+        used_ids.add(chain_id)
+
+    imported = []
+    for entry in entries:
+        entry = dict(entry)
+        if entry["chain_id"] is None:
+            entry["chain_id"] = next_free_chain_id(used_ids)
+            used_ids.add(entry["chain_id"])
+        error = validate_sequence_entry(entry)
+        if error:
+            errors.append(error)
+        imported.append(entry)
+
+    if errors:
+        return current_sequences, errors
+    return current_sequences + imported, []
+
+# --- 大体系的多细节层次 (LOD) 预览 ---
+# 原子数超过该阈值时，先显示粗粒度模型，全原子模型按需加载
+LOD_ATOM_THRESHOLD = 20000
+# 粗粒度模型中聚合物残基保留的代表原子：蛋白质 Cα，核酸磷原子
+LOD_BACKBONE_ATOMS = {"CA", "P"}
+
+def count_atom_site_rows(mmcif_text):
+    """按行统计 _atom_site 循环中的原子数，不做分词，用于判断是否需要粗粒度预览"""
+    count = 0
+    in_loop_header = False
+    is_atom_site = False
+    in_atom_rows = False
+    for line in mmcif_text.splitlines():
+        stripped = line.strip()
+        if in_atom_rows:
+            if not stripped or stripped.startswith(("#", "_", "loop_", "data_")):
+                break
+            count += 1
+        elif stripped == "loop_":
+            in_loop_header = True
+            is_atom_site = False
+        elif in_loop_header:
+            if stripped.startswith("_"):
+                is_atom_site = is_atom_site or stripped.startswith("_atom_site.")
+            else:
+                in_loop_header = False
+                if is_atom_site and stripped and not stripped.startswith("#"):
+                    in_atom_rows = True
+                    count += 1
+    return count
+
+def build_coarse_mmcif(mmcif_text):
+    """
+    生成粗粒度 mmCIF：标准聚合物残基仅保留 Cα / P 原子，配体等非标准残基保留全部原子，
+    其余类别原样保留。返回 (粗粒度文本, 原子总数, 保留原子数)。
+    """
+    standard_residues = set(THREE_TO_ONE) | set(DNA_RESIDUES) | set(RNA_RESIDUES)
+    out = []
+    columns = []
+    in_loop_header = False
+    in_atom_rows = False
+    atom_col = comp_col = group_col = None
+    total_atoms = kept_atoms = 0
+
+    for line in mmcif_text.splitlines(keepends=True):
+        stripped = line.strip()
+
+        if in_loop_header and not stripped.startswith("_"):
+            in_loop_header = False
+            if columns and columns[0].startswith("_atom_site."):
+                items = [col.split(".", 1)[1] for col in columns]
+                atom_item = next((item for item in ("label_atom_id", "auth_atom_id") if item in items), None)
+                comp_item = next((item for item in ("label_comp_id", "auth_comp_id") if item in items), None)
+                if atom_item is None or comp_item is None:
+                    raise ValueError("_atom_site 中缺少原子名或残基名列")
+                atom_col = items.index(atom_item)
+                comp_col = items.index(comp_item)
+                group_col = items.index("group_PDB") if "group_PDB" in items else None
+                in_atom_rows = True
+
+        if in_atom_rows:
+            if not stripped or stripped.startswith(("#", "_", "loop_", "data_")):
+                in_atom_rows = False
+            else:
+                # 原子名如 O5' 会被引号包裹，仅在必要时使用完整的 CIF 分词
+                if "'" in line or '"' in line:
+                    tokens = [value for value, _ in _tokenize_cif(line)]
+                else:
+                    tokens = line.split()
+                if len(tokens) != len(items):
+                    raise ValueError("_atom_site 行的列数与表头不一致")
+                total_atoms += 1
+                is_het = group_col is not None and tokens[group_col] == "HETATM"
+                if is_het or tokens[comp_col] not in standard_residues or tokens[atom_col] in LOD_BACKBONE_ATOMS:
+                    out.append(line)
+                    kept_atoms += 1
+                continue
+
+        if stripped == "loop_":
+            in_loop_header = True
+            columns = []
+        elif in_loop_header:
+            columns.append(stripped.split()[0])
+        out.append(line)
+
+    return "".join(out), total_atoms, kept_atoms
+
+# --- 跨会话微批处理 ---
+# 在该时间窗口内提交的兼容任务会合并为一次 boltz predict 调用
+BATCH_WINDOW_SECONDS = 2.0
+# 单批最多合并的任务数，达到后立即启动
+BATCH_MAX_JOBS = 16
+
+def build_boltz_command(input_dir, output_dir, recycling_steps, diffusion_samples, use_msa_server, use_potentials, gpu_count):
+    """构建 boltz predict 命令行"""
+    cmd = [
+        "boltz", "predict", str(input_dir),
+        "--out_dir", str(output_dir),
+        "--recycling_steps", str(recycling_steps),
+        "--diffusion_samples", str(diffusion_samples),
+        "--output_format", "mmcif", # 使用mmCIF以获得最佳兼容性
+        "--override" # 允许覆盖旧结果（在临时目录中通常不需要）
+    ]
+
+    # 添加GPU配置
+    if gpu_count > 1:
+        cmd.extend(["--devices", str(gpu_count)])
+
+    if use_msa_server:
+        cmd.append("--use_msa_server")
+    if use_potentials:
+        cmd.append("--use_potentials")
+    return cmd
+
+class BoltzBatcher:
+    """
+    跨会话的微批处理器。
+    在短时间窗口内收集运行参数一致的任务，将各自的 YAML 写入同一个共享输入目录，
+    只启动一次 boltz 进程（只加载一次模型），完成后把每个预测文件夹移回提交它的会话目录。
+    所有批次由同一个工作线程依次执行，任意时刻最多只有一个 boltz 进程；
+    运行期间新提交的任务继续累积到下一批。
+    每个任务通过自己的事件队列接收：
+      ("start", 等效命令字符串) / ("log", 日志行) / ("done", 返回码) / ("error", 异常)
+    日志中提到同批其他任务的行不会发送给当前任务，共享目录路径也会替换为任务自己的目录。
+    """
+
+    def __init__(self, window_seconds=BATCH_WINDOW_SECONDS, max_jobs=BATCH_MAX_JOBS):
+        self.window_seconds = window_seconds
+        self.max_jobs = max_jobs
+        self._cond = threading.Condition()
+        self._pending = {}  # 批处理键 -> 等待中的任务列表 (按提交顺序)
+        self._worker = None
+
+    def submit(self, batch_key, yaml_path, output_dir, config_name):
+        """
+        提交任务并返回其事件队列。
+        batch_key 为 (recycling_steps, diffusion_samples, use_msa_server, use_potentials, gpu_count)，
+        只有键完全相同的任务才会被合并。config_name 在所有会话中必须唯一。
+        """
+        job = {
+            "yaml_path": Path(yaml_path),
+            "output_dir": Path(output_dir),
+            "config_name": config_name,
+            "submitted_at": time.monotonic(),
+            "events": queue.Queue(),
+        }
+        with self._cond:
+            self._pending.setdefault(batch_key, []).append(job)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        return job["events"]
+
+    def _next_batch(self):
+        """等待并取出下一批：最早提交的批处理键，在时间窗口结束或满员后出队"""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            batch_key = min(self._pending, key=lambda key: self._pending[key][0]["submitted_at"])
+            jobs = self._pending[batch_key]
+            deadline = jobs[0]["submitted_at"] + self.window_seconds
+            while len(jobs) < self.max_jobs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, rest = jobs[:self.max_jobs], jobs[self.max_jobs:]
+            if rest:
+                self._pending[batch_key] = rest
+            else:
+                del self._pending[batch_key]
+            return batch_key, batch
+
+    def _worker_loop(self):
+        """唯一的工作线程：依次运行各批任务"""
+        while True:
+            batch_key, jobs = self._next_batch()
+            self._run_batch(batch_key, jobs)
+
+    def _run_batch(self, batch_key, jobs):
+        """运行一批任务；合批运行失败时逐个单独重新运行，避免一个任务的错误影响同批其他任务"""
+        finished = []
+        try:
+            for job in jobs:
+                cmd = build_boltz_command(job["yaml_path"].parent, job["output_dir"], *batch_key)
+                job["events"].put(("start", " ".join(cmd)))
+
+            returncode = self._execute(batch_key, jobs)
+            if returncode != 0 and len(jobs) > 1:
+                for job in jobs:
+                    job["events"].put(("log", f"\nℹ️ 合并运行以错误码 {returncode} 结束 (可能由同批其他任务引起)，正在单独重新运行本任务...\n\n"))
+                for job in jobs:
+                    job["events"].put(("done", self._execute(batch_key, [job])))
+                    finished.append(job)
+            else:
+                for job in jobs:
+                    job["events"].put(("done", returncode))
+                    finished.append(job)
+        except Exception as e:
+            for job in jobs:
+                if job not in finished:
+                    job["events"].put(("error", e))
+
+    def _execute(self, batch_key, jobs):
+        """在新的共享目录中运行一次 boltz，按任务过滤并转发日志，成功时将结果移回各任务目录"""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        batch_dir = Path("tmp") / f"boltz_batch_{timestamp}_{uuid.uuid4().hex[:8]}"
+        input_dir = batch_dir / "input"
+        output_dir = batch_dir / "output"
+        input_dir.mkdir(parents=True)
+        output_dir.mkdir()
+
+        for job in jobs:
+            shutil.copy(job["yaml_path"], input_dir / f"{job['config_name']}.yaml")
+
+        cmd = build_boltz_command(input_dir, output_dir, *batch_key)
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8'
+        )
+        while True:
+            line = process.stdout.readline()
+            if not line:
+                break
+            for job in jobs:
+                # 不向当前任务转发提及同批其他任务的日志行
+                if any(other is not job and other["config_name"] in line for other in jobs):
+                    continue
+                job["events"].put(("log", line.replace(str(batch_dir), str(job["output_dir"].parent))))
+        process.wait()
+
+        if process.returncode == 0:
+            # 将每个预测文件夹移回对应会话的输出目录，保持与单独运行时相同的目录结构
+            predictions_dir = output_dir / "boltz_results_input/predictions"
+            for job in jobs:
+                source = predictions_dir / job["config_name"]
+                if source.exists():
+                    target = job["output_dir"] / "boltz_results_input/predictions" / job["config_name"]
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.move(str(source), str(target))
+        return process.returncode
+
+boltz_batcher = BoltzBatcher()
+
 def run_boltz_prediction(
     sequences_config,
     use_msa_server,
@@ -176,23 +853,24 @@ def run_boltz_prediction(
     """
     # 1. 输入验证
     if not sequences_config or len(sequences_config) == 0:
-        return "错误：至少需要添加一个分子序列。", None, None, None, None, None, None
+        return "错误：至少需要添加一个分子序列。", None, None, None, None, None, None, gr.update(visible=False)
     
     # 验证亲和力预测设置
     if enable_affinity_prediction:
         if not affinity_binder_id.strip():
-            return "错误：启用亲和力预测时必须指定结合分子的链ID。", None, None, None, None, None, None
+            return "错误：启用亲和力预测时必须指定结合分子的链ID。", None, None, None, None, None, None, gr.update(visible=False)
         
         # 检查结合分子ID是否存在于配置中
         chain_ids = [seq.get("chain_id", "").strip() for seq in sequences_config if seq.get("chain_id", "").strip()]
         if affinity_binder_id.strip() not in chain_ids:
-            return f"错误：结合分子链ID '{affinity_binder_id}' 不存在于当前分子列表中。", None, None, None, None, None, None
+            return f"错误：结合分子链ID '{affinity_binder_id}' 不存在于当前分子列表中。", None, None, None, None, None, None, gr.update(visible=False)
 
     # 创建tmp目录来存放所有文件（便于查看和调试）
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_id = uuid.uuid4().hex[:8] # 同一秒内的并发提交也需互不冲突
     tmp_base_dir = Path("tmp")
     tmp_base_dir.mkdir(exist_ok=True)
-    run_dir = tmp_base_dir / f"boltz_run_{timestamp}"
+    run_dir = tmp_base_dir / f"boltz_run_{timestamp}_{run_id}"
     run_dir.mkdir(exist_ok=True)
     
     initial_3d_html = "<div style='height: 600px; display: flex; align-items: center; justify-content: center;'><p>等待预测结束...</p></div>"
@@ -204,7 +882,7 @@ def run_boltz_prediction(
         input_dir.mkdir()
         output_dir.mkdir()
 
-        config_name = "prediction_config"
+        config_name = f"prediction_config_{run_id}" # 批处理共享输入目录中必须唯一
         yaml_path = input_dir / f"{config_name}.yaml"
         
         # 构建YAML序列部分
@@ -271,56 +949,36 @@ def run_boltz_prediction(
         with open(yaml_path, 'w') as f:
             yaml.dump(config_data, f, sort_keys=False)
 
-        yield f"✅ YAML 配置文件已生成于: {yaml_path}\n配置了 {len(yaml_sequences)} 个分子链\n", initial_3d_html, "等待中...", "等待中...", None, None, None
+        yield f"✅ YAML 配置文件已生成于: {yaml_path}\n配置了 {len(yaml_sequences)} 个分子链\n", initial_3d_html, "等待中...", "等待中...", None, None, None, gr.update(visible=False)
 
-        # 3. 构建并运行 boltz 命令
-        cmd = [
-            "boltz", "predict", str(input_dir),
-            "--out_dir", str(output_dir),
-            "--recycling_steps", str(recycling_steps),
-            "--diffusion_samples", str(diffusion_samples),
-            "--output_format", "mmcif", # 使用mmCIF以获得最佳兼容性
-            "--override" # 允许覆盖旧结果（在临时目录中通常不需要）
-        ]
-        
-        # 添加GPU配置
-        if gpu_count > 1:
-            cmd.extend(["--devices", str(gpu_count)])
-        
-        if use_msa_server:
-            cmd.append("--use_msa_server")
-        if use_potentials:
-            cmd.append("--use_potentials")
-            
+        # 3. 提交到微批处理器，与其他会话中参数一致的任务合并为一次 boltz 调用
         gpu_info = f"使用 {gpu_count} 个GPU" if gpu_count > 1 else "使用单GPU"
-        yield f"⚙️ 准备运行 Boltz ({gpu_info})...\n命令: {' '.join(cmd)}\n\n", initial_3d_html, "等待中...", "等待中...", None, None, None
+        batch_key = (recycling_steps, diffusion_samples, bool(use_msa_server), bool(use_potentials), gpu_count)
+        events = boltz_batcher.submit(batch_key, yaml_path, output_dir, config_name)
+        yield "⏳ 已提交到批处理队列，等待合并兼容任务并排队运行...\n", initial_3d_html, "等待中...", "等待中...", None, None, None, gr.update(visible=False)
 
-        # 使用 Popen 实时流式传输输出
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT, 
-            text=True, 
-            encoding='utf-8'
-        )
-        
+        # 实时流式传输共享进程的输出
         log_output = ""
         while True:
-            line = process.stdout.readline()
-            if not line:
+            event = events.get()
+            if event[0] == "start":
+                yield f"⚙️ 准备运行 Boltz ({gpu_info})...\n等效命令: {event[1]}\n\n", initial_3d_html, "等待中...", "等待中...", None, None, None, gr.update(visible=False)
+            elif event[0] == "log":
+                log_output += event[1]
+                yield log_output, initial_3d_html, "运行中...", "运行中...", None, None, None, gr.update(visible=False)
+            elif event[0] == "done":
+                returncode = event[1]
                 break
-            log_output += line
-            yield log_output, initial_3d_html, "运行中...", "运行中...", None, None, None
-        
-        process.wait()
+            else:
+                raise event[1]
 
-        if process.returncode != 0:
-            final_log = log_output + f"\n\n❌ Boltz 进程以错误码 {process.returncode} 结束。"
-            yield final_log, initial_3d_html, "错误", "错误", None, None, None
+        if returncode != 0:
+            final_log = log_output + f"\n\n❌ Boltz 进程以错误码 {returncode} 结束。"
+            yield final_log, initial_3d_html, "错误", "错误", None, None, None, gr.update(visible=False)
             return
 
         final_log = log_output + "\n\n✅ Boltz 预测完成！"
-        yield final_log, initial_3d_html, "处理结果中...", "处理结果中...", None, None, None
+        yield final_log, initial_3d_html, "处理结果中...", "处理结果中...", None, None, None, gr.update(visible=False)
 
         # 4. 处理输出文件
         prediction_folder = output_dir / "boltz_results_input/predictions" / config_name
@@ -334,12 +992,26 @@ def run_boltz_prediction(
 
         structure_html_content = "<div style='height: 600px; display: flex; align-items: center; justify-content: center;'><p>未找到结构文件。</p></div>"
         best_structure_file_path_for_download = None
+        coarse_preview_shown = False
 
         if best_structure_file.exists():
             try:
                 mmcif_bytes = best_structure_file.read_bytes()
-                mmcif_base64 = base64.b64encode(mmcif_bytes).decode('utf-8')
-                structure_html_content = get_molstar_html(mmcif_base64)
+                structure_html_content = None
+                mmcif_text = mmcif_bytes.decode('utf-8', errors='replace')
+                total_atoms = count_atom_site_rows(mmcif_text)
+                if total_atoms > LOD_ATOM_THRESHOLD:
+                    # 大体系先显示粗粒度模型，避免浏览器解析全原子结构时卡顿
+                    try:
+                        coarse_text, _, kept_atoms = build_coarse_mmcif(mmcif_text)
+                        structure_html_content = get_molstar_html_from_bytes(coarse_text.encode('utf-8'))
+                        coarse_preview_shown = True
+                        final_log += (f"\n\nℹ️ 结构较大 ({total_atoms} 个原子)，已先显示粗粒度模型 ({kept_atoms} 个原子)。"
+                                      "\n点击 3D 结构页中的“加载全原子模型”查看完整结构。")
+                    except Exception as e:
+                        final_log += f"\n\n⚠️ 生成粗粒度模型失败，直接显示全原子模型: {e}"
+                if structure_html_content is None:
+                    structure_html_content = get_molstar_html_from_bytes(mmcif_bytes)
                 best_structure_file_path_for_download = str(best_structure_file)
             except Exception as e:
                 final_log += f"\n\n❌ 错误：处理结构文件以在Mol*中显示时出错: {e}"
@@ -369,15 +1041,16 @@ def run_boltz_prediction(
                affinity_md,
                best_structure_file_path_for_download,
                str(confidence_file) if confidence_file.exists() else None,
-               str(affinity_file) if affinity_file.exists() else None
+               str(affinity_file) if affinity_file.exists() else None,
+               gr.update(visible=coarse_preview_shown)
               )
 
     except FileNotFoundError:
         yield ("❌ 错误: `boltz` 命令未找到。\n"
                "请确保您已经安装了 `boltz-prediction`并且 `boltz` 在您的系统PATH中。", 
-               initial_3d_html, "错误", "错误", None, None, None)
+               initial_3d_html, "错误", "错误", None, None, None, gr.update(visible=False))
     except Exception as e:
-        yield f"❌ 发生意外错误: {e}", initial_3d_html, "错误", "错误", None, None, None
+        yield f"❌ 发生意外错误: {e}", initial_3d_html, "错误", "错误", None, None, None, gr.update(visible=False)
     # 注意：我们不清理临时目录，因为 Gradio 需要从那里提供文件下载。
     # Gradio 会在会话结束后自动处理临时文件。
 
@@ -411,6 +1084,7 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
             1. **配置分子序列**：
                - 手动添加：输入链ID、选择分子类型、输入序列，然后点击"添加分子"
                - 快速开始：点击示例按钮快速加载预设配置
+               - 批量导入：在"批量导入"面板中上传 FASTA、Boltz YAML、mmCIF 或 PDB 文件，一次性导入所有链（缺失的链ID将自动分配）
                - 删除配置：在"删除指定链ID"框中输入要删除的链ID（支持用逗号分隔多个，如 A,B,C），然后点击"删除"
                - 清空重置：点击"清空所有"按钮清除所有已配置的分子
                
@@ -422,6 +1096,7 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
             3. **开始预测**：点击"开始预测"按钮，等待计算完成
             
             4. **查看结果**：在不同标签页中查看运行日志、3D结构、置信度和亲和力分数
+               - 大型复合物会先显示粗粒度模型 (Cα/磷原子骨架 + 配体)，点击"加载全原子模型"查看完整结构
             
             ### 输入格式说明：
             - **蛋白质序列**：使用标准氨基酸单字母代码，如 `MKITIGSGVSAAKKFV...`
@@ -437,6 +1112,7 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
             - 复杂结构的预测时间较长，请耐心等待
             - GPU数量设置：更多GPU可以加速预测，但也会消耗更多显存
             - 临时文件自动保存在当前目录的tmp文件夹中，便于查看和调试
+            - 多位用户在短时间内提交参数相同 (循环步数、样本数、势能、MSA、GPU数) 的任务时，会合并为一次 Boltz 运行以提高吞吐，各自结果仍互相独立
             """
         )
 
@@ -479,7 +1155,16 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
                     scale=3
                 )
                 delete_specific_btn = gr.Button("❌ 删除", variant="secondary", scale=1)
-            
+
+            # 批量导入
+            with gr.Accordion("📥 批量导入 (FASTA / Boltz YAML / mmCIF / PDB)", open=False):
+                import_files = gr.File(
+                    label="选择一个或多个文件",
+                    file_count="multiple",
+                    file_types=[".fasta", ".fa", ".faa", ".fna", ".fas", ".yaml", ".yml", ".cif", ".mmcif", ".pdb", ".ent"]
+                )
+                import_btn = gr.Button("📥 导入到分子列表", variant="secondary")
+
             # 显示当前配置的序列
             sequences_display = gr.Dataframe(
                 headers=["链ID", "分子类型", "序列/标识符"],
@@ -536,6 +1221,7 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
                         label="最佳预测结构 (排名 1)", 
                         value="<div style='height: 600px; display: flex; align-items: center; justify-content: center;'><p>等待预测开始...</p></div>"
                     )
+                    load_full_structure_btn = gr.Button("🔍 加载全原子模型", variant="secondary", size="sm", visible=False)
                 with gr.TabItem("📊 置信度分数"):
                     confidence_output = gr.Markdown("预测完成后，此处将显示置信度分数。")
                 with gr.TabItem("💞 亲和力分数"):
@@ -566,8 +1252,7 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
         updated_sequences = current_sequences + [new_sequence]
         
         # 转换为显示格式
-        display_data = [[seq["chain_id"], seq["mol_type"], seq["sequence"][:50] + "..." if len(seq["sequence"]) > 50 else seq["sequence"]] 
-                       for seq in updated_sequences]
+        display_data = sequences_to_display(updated_sequences)
         
         return updated_sequences, display_data, f"✅ 成功添加分子：{chain_id} ({mol_type})"
     
@@ -595,14 +1280,57 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
             return current_sequences, current_sequences, f"错误：未找到指定的链ID: {', '.join(chain_ids)}"
         
         # 转换为显示格式
-        display_data = [[seq["chain_id"], seq["mol_type"], seq["sequence"][:50] + "..." if len(seq["sequence"]) > 50 else seq["sequence"]] 
-                       for seq in remaining_sequences]
+        display_data = sequences_to_display(remaining_sequences)
         
         if deleted_count == 1:
             return remaining_sequences, display_data, f"✅ 成功删除链ID '{chain_ids[0]}' 的分子配置"
         else:
             return remaining_sequences, display_data, f"✅ 成功删除 {deleted_count} 个分子配置: {', '.join(chain_ids[:deleted_count])}"
     
+    def import_sequence_files(files, current_sequences):
+        """从上传的文件中批量导入分子配置，整批校验通过后才写入状态"""
+        if not files:
+            return current_sequences, sequences_to_display(current_sequences), "请先选择要导入的文件"
+
+        entries = []
+        warnings = []
+        errors = []
+        for file in files:
+            file_path = file if isinstance(file, str) else file.name
+            try:
+                file_entries, file_warnings = parse_sequence_file(file_path)
+                entries.extend(file_entries)
+                warnings.extend(file_warnings)
+            except Exception as e:
+                errors.append(f"{Path(file_path).name}: {e}")
+
+        if not errors and not entries:
+            errors.append("文件中未找到任何分子序列")
+        if not errors:
+            try:
+                updated_sequences, errors = import_sequence_entries(current_sequences, entries)
+            except ValueError as e:
+                errors = [str(e)]
+
+        if errors:
+            return current_sequences, sequences_to_display(current_sequences), "错误：导入失败，未添加任何分子\n- " + "\n- ".join(errors)
+
+        imported_ids = [seq["chain_id"] for seq in updated_sequences[len(current_sequences):]]
+        status = f"✅ 成功导入 {len(imported_ids)} 个分子：{', '.join(imported_ids)}"
+        if warnings:
+            status += "\n⚠️ 注意：\n- " + "\n- ".join(warnings)
+        return updated_sequences, sequences_to_display(updated_sequences), status
+
+    def load_full_structure(structure_file):
+        """按需加载全原子结构到 Mol* 查看器，加载后隐藏按钮"""
+        if not structure_file:
+            return gr.update(), gr.update(visible=False)
+        structure_path = structure_file if isinstance(structure_file, str) else structure_file.name
+        try:
+            return get_molstar_html_from_bytes(Path(structure_path).read_bytes()), gr.update(visible=False)
+        except Exception as e:
+            return f"<div style='height: 600px; display: flex; align-items: center; justify-content: center;'><p>加载全原子结构时出错: {e}</p></div>", gr.update(visible=False)
+
     def toggle_affinity_options(enable_affinity):
         """切换亲和力预测选项的可见性"""
         return gr.update(visible=enable_affinity)
@@ -613,8 +1341,7 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
             {"chain_id": "A", "mol_type": "蛋白质", "sequence": "MKITIGSGVSAAKKFVGLKQPGRYDYKVLAYPIAVEALSLIYNKDLLPNPPKTWEEIPALDKELKAFDISTEELSA"},
             {"chain_id": "L", "mol_type": "配体(SMILES)", "sequence": "C1=CC=C(C=C1)C(=O)O"}
         ]
-        display_data = [[seq["chain_id"], seq["mol_type"], seq["sequence"][:50] + "..." if len(seq["sequence"]) > 50 else seq["sequence"]] 
-                       for seq in example_sequences]
+        display_data = sequences_to_display(example_sequences)
         return example_sequences, display_data, "✅ 已加载示例1：蛋白质-配体复合物"
     
     def load_example2():
@@ -623,8 +1350,7 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
             {"chain_id": "A", "mol_type": "蛋白质", "sequence": "MTEYKLVVVGAGGVGKSALTIQLIQNHFVDEYDPTIEDSYRKQVVIDGETCLLDILDTAGQEEYSAMRDQYMRTGEGFLCVFAINNTKSFEDIHQYREQIKRVKDSDDVPMVLVGNKCDLAARTVESRQAQDLARSYGIPYIETSAKTRQGVEDAFYTLVREIRQHKLRKLNPPDESGPGCMSKCVLS"},
             {"chain_id": "D", "mol_type": "DNA", "sequence": "ATCGATCGATCGATCG"}
         ]
-        display_data = [[seq["chain_id"], seq["mol_type"], seq["sequence"][:50] + "..." if len(seq["sequence"]) > 50 else seq["sequence"]] 
-                       for seq in example_sequences]
+        display_data = sequences_to_display(example_sequences)
         return example_sequences, display_data, "✅ 已加载示例2：蛋白质-DNA复合物"
     
     def load_example3():
@@ -635,8 +1361,7 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
             {"chain_id": "R", "mol_type": "RNA", "sequence": "AUCGAUCGAUCGAUCG"},
             {"chain_id": "L1", "mol_type": "配体(CCD)", "sequence": "ATP"}
         ]
-        display_data = [[seq["chain_id"], seq["mol_type"], seq["sequence"][:50] + "..." if len(seq["sequence"]) > 50 else seq["sequence"]] 
-                       for seq in example_sequences]
+        display_data = sequences_to_display(example_sequences)
         return example_sequences, display_data, "✅ 已加载示例3：多链复合物 (蛋白质二聚体 + RNA + ATP)"
 
     # 事件绑定
@@ -674,6 +1399,18 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
         outputs=[sequences_state, sequences_display, status_log]
     )
     
+    import_btn.click(
+        fn=import_sequence_files,
+        inputs=[import_files, sequences_state],
+        outputs=[sequences_state, sequences_display, status_log]
+    )
+
+    load_full_structure_btn.click(
+        fn=load_full_structure,
+        inputs=[download_structure],
+        outputs=[model_3d_view, load_full_structure_btn]
+    )
+
     enable_affinity.change(
         fn=toggle_affinity_options,
         inputs=[enable_affinity],
@@ -700,8 +1437,11 @@ with gr.Blocks(theme=gr.themes.Base()) as demo:
             affinity_output,
             download_structure,
             download_confidence,
-            download_affinity
-        ]
+            download_affinity,
+            load_full_structure_btn
+        ],
+        # 允许多个会话同时排队，微批处理器才能将它们合并
+        concurrency_limit=BATCH_MAX_JOBS
     )
 
 if __name__ == "__main__":